@@ -13,39 +13,693 @@ Extras:
     python minigit.py status
 """
 
+import os
 import sys
 import json
+import mmap
+import stat
+import bisect
+import heapq
+import io
+import errno
+import shutil
+import hashlib
+import threading
 from pathlib import Path
 from datetime import datetime
-from typing import Any, Dict, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, BinaryIO, Callable, Dict, Iterable, List, Optional, Set, Tuple, TypeVar, Union
+
+try:
+    import orjson  # opcional: bastante más rápido que el módulo json estándar
+except ImportError:
+    orjson = None
+
+try:
+    import fcntl  # no existe en Windows
+except ImportError:
+    fcntl = None
+
+try:
+    import zstandard as zstd  # opcional: comprime los objetos guardados
+except ImportError:
+    zstd = None
 
 # Directorios base (siempre relativos al directorio actual)
 REPO_DIR = Path.cwd()
 MINIGIT_DIR = REPO_DIR / ".minigit"
 COMMITS_DIR = MINIGIT_DIR / "commits"
 OBJECTS_DIR = MINIGIT_DIR / "objects"
-INDEX_FILE = MINIGIT_DIR / "index.json"
+# Área de preparación: una ruta por línea, ordenadas
+INDEX_FILE = MINIGIT_DIR / "index.txt"
+LEGACY_INDEX_FILE = MINIGIT_DIR / "index.json"
+# Caché de 'stat' de los archivos confirmados: {ruta: {hash, size, mtime_ns}}
+STAT_CACHE_FILE = MINIGIT_DIR / "stat_cache.json"
+# Opciones del repositorio, por ejemplo {"delta": true}
+CONFIG_FILE = MINIGIT_DIR / "config.json"
 HEAD_FILE = MINIGIT_DIR / "head.json"
 
+# Los commits se guardan uno por línea en un único archivo (pack) y el índice
+# guarda, para cada id, dónde empieza y cuánto mide su línea: "<id>\0<offset>\0<largo>"
+COMMITS_PACK = COMMITS_DIR / "commits.pack"
+COMMITS_IDX = COMMITS_DIR / "commits.idx"
+# Resumen de cada commit (id, fecha, mensaje y rutas), una línea por commit, para 'log'
+COMMITS_META = COMMITS_DIR / "commits_meta.jsonl"
+
+# Tamaño de bloque para leer archivos por partes (1 MiB); también es el tamaño
+# del buffer al leer/escribir contenido de archivos (el de Python es de solo 8 KiB)
+CHUNK_SIZE = 1 << 20
+
+# Sin orjson, 'log' lee commits_meta.jsonl con pyarrow (si está instalado) a partir
+# de este tamaño: el parser estándar de json es lento, pero importar pyarrow ya tarda
+# unos 100 ms, así que para archivos chicos no conviene. Con orjson la lectura
+# línea por línea es más rápida que pyarrow y no se usa.
+ARROW_MIN_META_SIZE = 4 << 20
+
+# Nivel de compresión zstd de los objetos y sufijo que los identifica en disco
+ZSTD_LEVEL = 3
+ZSTD_SUFFIX = ".zst"
+
+# Deltas (opcional, "delta": true en config.json): una nueva versión de un archivo
+# se guarda como diferencia zstd respecto a la versión del commit anterior.
+# Un objeto delta es '<hash>.delta': una línea "<hash_base> <profundidad>" y luego los datos.
+DELTA_SUFFIX = ".delta"
+DELTA_MIN_SIZE = 64 << 10
+DELTA_MAX_SIZE = 64 << 20  # vale para el archivo y para la base: ambos se cargan completos en memoria
+MAX_DELTA_CHAIN = 10       # cadenas de deltas más largas hacen lento el restore
+
+# ioctl FICLONE de Linux: crea una copia "reflink" (los datos se comparten hasta que se modifican)
+FICLONE = 0x40049409
+
+# Tamaño a partir del cual se reserva espacio antes de copiar (1 MiB)
+PREALLOCATE_MIN_SIZE = 1 << 20
+
+# Por debajo de esta cantidad de archivos no vale la pena usar hilos
+PARALLEL_MIN_FILES = 4
+MAX_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+# Rutas de origen: en los bucles de commit se usan cadenas para no crear objetos Path
+PathArg = Union[str, Path]
+
+T = TypeVar("T")
+R = TypeVar("R")
+
 
 # ----------------- Utilidades -----------------
 
+def json_dumps(data: Any) -> bytes:
+    """Serializa 'data' como JSON compacto en UTF-8 (con orjson si está instalado)."""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def json_loads(raw: bytes) -> Any:
+    """Interpreta el JSON en 'raw' (con orjson si está instalado)."""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def temp_path(path: Path) -> Path:
+    """Ruta temporal única (por proceso e hilo) junto a 'path', para escribir y luego renombrar."""
+    return path.with_name(f"{path.name}.tmp.{os.getpid()}.{threading.get_ident()}")
+
+
 def load_json(path: Path, default: Any) -> Any:
-    """Carga JSON desde 'path'. Si no existe o está corrupto, devuelve 'default'."""
-    if not path.exists():
-        return default
+    """Carga JSON desde 'path'. Si no existe, devuelve 'default'.
+
+    Si el archivo existe pero está corrupto se termina con un error, en lugar de
+    seguir con 'default' (eso, por ejemplo, vaciaría el área de preparación).
+    """
     try:
-        with path.open("r", encoding="utf-8") as f:
-            return json.load(f)
-    except (json.JSONDecodeError, OSError):
+        return json_loads(path.read_bytes())
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        print(f"Error: el archivo '{path}' está corrupto y no se puede leer.")
+        sys.exit(1)
+    except OSError:
         return default
 
 
 def save_json(path: Path, data: Any) -> None:
-    """Guarda 'data' como JSON en 'path'."""
+    """Guarda 'data' como JSON en 'path'.
+
+    Se escribe primero en un archivo temporal y luego se reemplaza el original,
+    así nunca queda un JSON a medio escribir.
+    """
+    raw = json_dumps(data)
     path.parent.mkdir(parents=True, exist_ok=True)
-    with path.open("w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=4)
+    tmp = temp_path(path)
+    with tmp.open("wb") as f:
+        f.write(raw)
+    os.replace(tmp, path)  # el renombrado es atómico: se ve el archivo viejo o el nuevo, nunca uno a medias
+
+
+def open_binary(path: PathArg, mode: str) -> BinaryIO:
+    """Abre 'path' en modo binario con un buffer de CHUNK_SIZE."""
+    return open(path, mode, buffering=CHUNK_SIZE)
+
+
+def hash_file(path: PathArg) -> str:
+    """Calcula el hash SHA-1 (como Git) del contenido de 'path', leyendo por bloques.
+
+    En Python 3.11+ se usa hashlib.file_digest, que hace el bucle de lectura en C.
+    """
+    with open_binary(path, "rb") as f:
+        if hasattr(hashlib, "file_digest"):
+            return hashlib.file_digest(f, "sha1").hexdigest()
+        h = hashlib.sha1()
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def files_equal(a: Path, b: Path) -> bool:
+    """Compara el contenido de dos archivos.
+
+    Usa mmap y compara por bloques, así el sistema solo lee las páginas que hacen
+    falta y se detiene en el primer bloque distinto.
+    """
+    size = a.stat().st_size
+    if size != b.stat().st_size:
+        return False
+    if size == 0:
+        return True  # mmap no admite archivos vacíos
+    with a.open("rb") as fa, b.open("rb") as fb, \
+            mmap.mmap(fa.fileno(), 0, access=mmap.ACCESS_READ) as ma, \
+            mmap.mmap(fb.fileno(), 0, access=mmap.ACCESS_READ) as mb:
+        for start in range(0, size, CHUNK_SIZE):
+            if ma[start:start + CHUNK_SIZE] != mb[start:start + CHUNK_SIZE]:
+                return False
+    return True
+
+
+def stat_entry(path: Path, object_id: str) -> Dict[str, Any]:
+    """Entrada de la caché de 'stat': hash, tamaño y fecha de modificación."""
+    st = path.stat()
+    return {"hash": object_id, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def load_stat_cache() -> Tuple[Dict[str, Dict[str, Any]], int]:
+    """Carga la caché de 'stat' y devuelve (caché, mtime_ns de stat_cache.json).
+
+    A diferencia de load_json, si el archivo está dañado no es un error: es solo una
+    caché, así que se usa vacía y los archivos se vuelven a hashear.
+    """
+    try:
+        cache_mtime_ns = STAT_CACHE_FILE.stat().st_mtime_ns
+        cache = json_loads(STAT_CACHE_FILE.read_bytes())
+    except (OSError, ValueError):  # ValueError incluye JSON inválido y UTF-8 inválido
+        return {}, 0
+    if not isinstance(cache, dict):
+        return {}, 0
+    return cache, cache_mtime_ns
+
+
+def cached_hash(cached: Optional[Dict[str, Any]], st: os.stat_result, cache_mtime_ns: int) -> Optional[str]:
+    """Hash guardado en la caché si tamaño y fecha de modificación siguen iguales; si no, None.
+
+    Igual que Git, no se confía en archivos modificados en el mismo instante en que
+    se escribió la caché (o después): podrían haber cambiado sin que cambie su fecha.
+    """
+    if (cached and cached.get("size") == st.st_size
+            and cached.get("mtime_ns") == st.st_mtime_ns
+            and st.st_mtime_ns < cache_mtime_ns):
+        return cached.get("hash")
+    return None
+
+
+def fast_copy(src: PathArg, dst: Path) -> None:
+    """Copia 'src' en 'dst' sin cargar el archivo completo en memoria.
+
+    En Linux usa os.copy_file_range (la copia la hace el kernel); si no está
+    disponible o falla, usa shutil.copyfile. Para archivos grandes se reserva
+    antes todo el espacio del destino, así el sistema de archivos no lo fragmenta.
+    El tamaño se toma del archivo ya abierto, no de un 'stat' anterior que podría estar desactualizado.
+    """
+    if hasattr(os, "copy_file_range"):
+        try:
+            with open(src, "rb") as f_src, dst.open("wb") as f_dst:
+                fd_in, fd_out = f_src.fileno(), f_dst.fileno()
+                remaining = os.fstat(fd_in).st_size
+                if remaining > PREALLOCATE_MIN_SIZE:
+                    try:
+                        os.posix_fallocate(fd_out, 0, remaining)
+                    except (AttributeError, OSError):
+                        pass  # No soportado en esta plataforma o sistema de archivos
+                total = 0
+                while remaining > 0:
+                    copied = os.copy_file_range(fd_in, fd_out, remaining)
+                    if copied == 0:
+                        break
+                    total += copied
+                    remaining -= copied
+                # Si el origen resultó más corto, quitar el resto reservado por posix_fallocate
+                os.ftruncate(fd_out, total)
+            # Si no se copió nada (archivo vacío o que no admite copy_file_range, como
+            # los de /proc), igual que shutil se prueba con la copia normal
+            if total > 0:
+                return
+        except OSError as e:
+            if e.errno not in (errno.ENOSYS, errno.EXDEV, errno.EINVAL, errno.EOPNOTSUPP):
+                raise
+    shutil.copyfile(src, dst)
+
+
+def reflink_or_copy(src: PathArg, dst: Path) -> None:
+    """Copia 'src' en 'dst' como reflink si el sistema de archivos lo permite (btrfs, XFS...).
+
+    Un reflink no copia datos: ambos archivos comparten los bloques y el sistema
+    los duplica solo si uno se modifica. Si no es posible, se usa fast_copy.
+    No se usan enlaces duros: editar el archivo restaurado modificaría el objeto guardado.
+    """
+    if fcntl is not None and sys.platform.startswith("linux"):
+        try:
+            with open(src, "rb") as f_src, dst.open("wb") as f_dst:
+                fcntl.ioctl(f_dst.fileno(), FICLONE, f_src.fileno())
+            return
+        except OSError:
+            pass
+    fast_copy(src, dst)
+
+
+def is_content_id(object_id: str) -> bool:
+    """Indica si 'object_id' es un hash SHA-1 (objeto guardado por contenido)."""
+    return len(object_id) == 40 and all(c in "0123456789abcdef" for c in object_id)
+
+
+def object_path(object_id: str) -> Path:
+    """Devuelve la ruta del objeto en 'objects/'.
+
+    Los objetos nuevos se guardan por contenido en 'objects/<hh>/<resto_del_hash>'.
+    Los commits antiguos guardan nombres del tipo '<id>_<ruta>' directamente en 'objects/'.
+    """
+    if is_content_id(object_id):
+        return OBJECTS_DIR / object_id[:2] / object_id[2:]
+    return OBJECTS_DIR / object_id
+
+
+def run_parallel(func: Callable[[T], R], items: Iterable[T]) -> List[R]:
+    """Aplica 'func' a cada elemento usando un pool de hilos (el trabajo es de E/S).
+
+    Los resultados se devuelven en el mismo orden que 'items'. Con pocos
+    elementos se ejecuta en serie para no pagar el costo de crear el pool.
+    """
+    items = list(items)
+    if len(items) < PARALLEL_MIN_FILES:
+        return [func(item) for item in items]
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        return list(pool.map(func, items))
+
+
+def load_index() -> List[str]:
+    """Devuelve las rutas del área de preparación, ordenadas.
+
+    Si el repositorio todavía usa el formato antiguo (index.json), se lee de ahí.
+    """
+    try:
+        text = INDEX_FILE.read_bytes().decode("utf-8")
+    except FileNotFoundError:
+        return sorted(load_json(LEGACY_INDEX_FILE, {}).get("files", []))
+    # Solo "\n" separa rutas: splitlines() también corta en "\r", "\u2028" y otros
+    # caracteres que pueden aparecer en un nombre de archivo
+    files = text.split("\n")
+    if files[-1] == "":
+        files.pop()
+    return files
+
+
+def save_index(files: List[str]) -> None:
+    """Guarda las rutas (ya ordenadas) del área de preparación, una por línea."""
+    tmp = temp_path(INDEX_FILE)
+    tmp.write_bytes("".join(f"{rel}\n" for rel in files).encode("utf-8"))
+    os.replace(tmp, INDEX_FILE)
+    if LEGACY_INDEX_FILE.exists():
+        LEGACY_INDEX_FILE.unlink()
+
+
+def _append_line(path: Path, line: bytes) -> int:
+    """Agrega 'line' como una línea nueva al final de 'path' y devuelve dónde empieza.
+
+    Si la última línea quedó sin terminar (una escritura cortada), primero se
+    cierra con un salto de línea, para no pegarle la nueva.
+    """
+    with path.open("a+b") as f:
+        end = f.seek(0, os.SEEK_END)
+        if end > 0:
+            f.seek(end - 1)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+                end += 1
+        f.write(line + b"\n")
+    return end
+
+
+def append_commit(data: Dict[str, Any]) -> None:
+    """Agrega el commit 'data' al final de commits.pack y registra su posición en commits.idx."""
+    blob = json_dumps(data)
+    COMMITS_DIR.mkdir(parents=True, exist_ok=True)
+    offset = _append_line(COMMITS_PACK, blob)
+    _append_line(COMMITS_IDX, f"{data['id']}\0{offset}\0{len(blob)}".encode("utf-8"))
+    _append_line(COMMITS_META, json_dumps(commit_summary(data)))
+
+
+def commit_summary(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Lo que necesita 'log' de un commit: id, fecha, mensaje y lista ordenada de rutas."""
+    return {
+        "id": data.get("id"),
+        "datetime": data.get("datetime", "desconocida"),
+        "message": data.get("message", ""),
+        "files": sorted(data.get("files", {}))
+    }
+
+
+def load_commit_index() -> Dict[int, Tuple[int, int]]:
+    """Lee commits.idx y devuelve {id: (offset, largo)}."""
+    index: Dict[int, Tuple[int, int]] = {}
+    if not COMMITS_IDX.is_file():
+        return index
+    with COMMITS_IDX.open("r", encoding="utf-8") as f:
+        for line in f:
+            parts = line.rstrip("\n").split("\0")
+            if not line.endswith("\n") or len(parts) != 3:
+                # Línea incompleta (por ejemplo, si se cortó una escritura)
+                continue
+            try:
+                index[int(parts[0])] = (int(parts[1]), int(parts[2]))
+            except ValueError:
+                continue
+    return index
+
+
+def load_commit(commit_id: int,
+                commit_index: Optional[Dict[int, Tuple[int, int]]] = None) -> Optional[Dict[str, Any]]:
+    """Carga un commit por id.
+
+    Devuelve None si el commit no existe y {} si está corrupto.
+    Los commits antiguos guardados como commits/<id>.json se siguen leyendo.
+    Si ya se leyó commits.idx (load_commit_index) se puede pasar en 'commit_index'.
+    """
+    if commit_index is None:
+        commit_index = load_commit_index()
+    entry = commit_index.get(commit_id)
+    if entry is None:
+        legacy_path = COMMITS_DIR / f"{commit_id}.json"
+        if not legacy_path.is_file():
+            return None
+        return load_json(legacy_path, {})
+
+    offset, length = entry
+    try:
+        with COMMITS_PACK.open("rb") as pack:
+            pack.seek(offset)
+            return json_loads(pack.read(length))
+    except (json.JSONDecodeError, UnicodeDecodeError, OSError):
+        return {}
+
+
+def _read_summaries_arrow(path: Path) -> Optional[List[Dict[str, Any]]]:
+    """Lee todo commits_meta.jsonl de una vez con el parser JSON de pyarrow (en C++).
+
+    Devuelve None si pyarrow no está instalado o el archivo tiene líneas inválidas,
+    para que se use la lectura línea por línea.
+    """
+    try:
+        # Import tardío: pyarrow es opcional y pesado de importar
+        import pyarrow as pa
+        import pyarrow.json as paj
+    except ImportError:
+        return None
+
+    schema = pa.schema([
+        ("id", pa.int64()),
+        ("datetime", pa.string()),
+        ("message", pa.string()),
+        ("files", pa.list_(pa.string()))
+    ])
+    try:
+        table = paj.read_json(path, parse_options=paj.ParseOptions(explicit_schema=schema))
+    except (pa.ArrowInvalid, OSError):
+        return None
+    return table.to_pylist()
+
+
+def load_commit_summaries() -> Dict[int, Dict[str, Any]]:
+    """Lee commits_meta.jsonl y devuelve {id: resumen} (ver commit_summary)."""
+    summaries: Dict[int, Dict[str, Any]] = {}
+    if not COMMITS_META.is_file():
+        return summaries
+
+    rows = None
+    if orjson is None and COMMITS_META.stat().st_size >= ARROW_MIN_META_SIZE:
+        rows = _read_summaries_arrow(COMMITS_META)
+    if rows is not None:
+        return {int(row["id"]): row for row in rows}
+
+    with COMMITS_META.open("rb") as meta:
+        for line in meta:
+            try:
+                summary = json_loads(line)
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                # Línea incompleta o corrupta: se omite
+                continue
+            summaries[int(summary["id"])] = summary
+    return summaries
+
+
+def iter_commit_summaries(last_id: int) -> Iterable[Dict[str, Any]]:
+    """Recorre el resumen de los commits desde 'last_id' hasta el 1 (del más reciente al más antiguo).
+
+    Los ids son consecutivos, así que no hace falta listar ni ordenar archivos.
+    Los resúmenes salen de commits_meta.jsonl, sin tocar el mapa completo de
+    archivos de commits.pack; los commits que no tienen resumen (los antiguos
+    <id>.json o los del pack anteriores a commits_meta.jsonl) se cargan completos.
+    """
+    summaries = load_commit_summaries()
+    commit_index = None
+    for cid in range(last_id, 0, -1):
+        summary = summaries.get(cid)
+        if summary is None:
+            if commit_index is None:
+                commit_index = load_commit_index()
+            data = load_commit(cid, commit_index)
+            if not data:
+                continue
+            summary = commit_summary(data)
+        yield summary
+
+
+def find_object(object_id: str) -> Optional[Path]:
+    """Devuelve la ruta del objeto guardado (comprimido, delta o tal cual), o None si no existe."""
+    path = object_path(object_id)
+    for suffix in (ZSTD_SUFFIX, DELTA_SUFFIX):
+        candidate = path.with_name(path.name + suffix)
+        if candidate.is_file():
+            return candidate
+    if path.is_file():
+        return path
+    return None
+
+
+def _require_zstd() -> None:
+    if zstd is None:
+        raise RuntimeError("los objetos están comprimidos; instala el paquete 'zstandard'.")
+
+
+def _delta_dict(base: bytes) -> Any:
+    """Diccionario zstd formado por el contenido (tal cual) de la versión base."""
+    return zstd.ZstdCompressionDict(base, dict_type=zstd.DICT_TYPE_RAWCONTENT)
+
+
+def _common_len(a: bytes, b: bytes, from_end: bool) -> int:
+    """Cantidad de bytes iguales al principio (o al final) de 'a' y 'b'.
+
+    Compara por bloques de CHUNK_SIZE y, dentro del primer bloque distinto,
+    busca el byte exacto con búsqueda binaria.
+    """
+    def same(start: int, end: int) -> bool:
+        # Tramo [start, end) contado desde el principio, o desde el final si 'from_end'
+        if from_end:
+            return a[len(a) - end:len(a) - start] == b[len(b) - end:len(b) - start]
+        return a[start:end] == b[start:end]
+
+    limit = min(len(a), len(b))
+    n = 0
+    while n < limit:
+        step = min(CHUNK_SIZE, limit - n)
+        if not same(n, n + step):
+            lo, hi = n, n + step
+            while hi - lo > 1:
+                mid = (lo + hi) // 2
+                if same(n, mid):
+                    lo = mid
+                else:
+                    hi = mid
+            return lo
+        n += step
+    return limit
+
+
+def _read_delta(obj_path: Path) -> Tuple[str, int, int, int, bytes]:
+    """Lee un objeto delta y devuelve (hash_base, profundidad, prefijo, sufijo, datos comprimidos).
+
+    Los deltas sin prefijo ni sufijo en la cabecera usan la base completa (0, 0).
+    """
+    header, payload = obj_path.read_bytes().split(b"\n", 1)
+    fields = header.decode("ascii").split()
+    prefix, suffix = (int(x) for x in fields[2:4]) if len(fields) > 2 else (0, 0)
+    return fields[0], int(fields[1]), prefix, suffix, payload
+
+
+def _apply_delta(obj_path: Path) -> bytes:
+    """Reconstruye el contenido de un objeto delta a partir de su base."""
+    _require_zstd()
+    base_id, _, prefix, suffix, payload = _read_delta(obj_path)
+    base = read_object_bytes(base_id)
+    end = len(base) - suffix
+    middle = zstd.ZstdDecompressor(dict_data=_delta_dict(base[prefix:end])).decompress(payload)
+    return base[:prefix] + middle + base[end:]
+
+
+def _delta_depth(obj_path: Path) -> int:
+    """Cantidad de deltas que hay que aplicar para reconstruir el objeto (0 si no es delta)."""
+    if not obj_path.name.endswith(DELTA_SUFFIX):
+        return 0
+    with obj_path.open("rb") as f:
+        return int(f.readline().split()[1])
+
+
+def read_object_bytes(object_id: str) -> bytes:
+    """Devuelve el contenido original completo del objeto 'object_id'."""
+    obj_path = find_object(object_id)
+    if obj_path is None:
+        raise RuntimeError(f"falta el objeto {object_id}.")
+
+    if obj_path.name.endswith(DELTA_SUFFIX):
+        return _apply_delta(obj_path)
+
+    if obj_path.name.endswith(ZSTD_SUFFIX):
+        _require_zstd()
+        out = io.BytesIO()
+        with open_binary(obj_path, "rb") as f_src:
+            zstd.ZstdDecompressor().copy_stream(f_src, out, read_size=CHUNK_SIZE, write_size=CHUNK_SIZE)
+        return out.getvalue()
+
+    return obj_path.read_bytes()
+
+
+def _write_object(dest: Path, *parts: bytes) -> None:
+    """Escribe 'parts' en 'dest' a través de un temporal que después se renombra."""
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = temp_path(dest)
+    with tmp.open("wb") as f_dst:
+        for part in parts:
+            f_dst.write(part)
+    os.replace(tmp, dest)
+
+
+def store_delta(src: PathArg, base_id: str, base_size: int) -> Optional[str]:
+    """Intenta guardar 'src' como delta respecto al objeto 'base_id' (de 'base_size' bytes).
+
+    Devuelve el hash del contenido guardado, o None (sin haber leído el archivo)
+    si no corresponde: zstandard no está instalado, el tamaño del archivo o de la
+    base está fuera de rango, la base no existe o la cadena de deltas ya es muy larga.
+    El hash se calcula sobre los mismos bytes con los que se arma el delta. Si el
+    delta no ahorra lo suficiente, el objeto se guarda comprimido completo.
+    """
+    if zstd is None or not is_content_id(base_id) or base_size > DELTA_MAX_SIZE:
+        return None
+    base_path = find_object(base_id)
+    if base_path is None:
+        return None
+    depth = _delta_depth(base_path) + 1
+    if depth > MAX_DELTA_CHAIN:
+        return None
+
+    with open_binary(src, "rb") as f_src:
+        if not DELTA_MIN_SIZE < os.fstat(f_src.fileno()).st_size <= DELTA_MAX_SIZE:
+            return None
+        data = f_src.read()
+    object_id = hashlib.sha1(data).hexdigest()
+    if find_object(object_id) is not None:
+        return object_id  # el contenido ya estaba guardado (por ejemplo, es igual a la base)
+    base = read_object_bytes(base_id)
+
+    # El principio y el final que no cambiaron se guardan solo como longitudes.
+    # zstd no encuentra coincidencias lejanas dentro de un diccionario grande (sus
+    # tablas no alcanzan a indexarlo), así que solo se le pasa el tramo que cambió.
+    prefix = _common_len(base, data, from_end=False)
+    limit = min(len(base), len(data)) - prefix
+    suffix = min(_common_len(base, data, from_end=True), limit)
+    base_middle = base[prefix:len(base) - suffix]
+    data_middle = data[prefix:len(data) - suffix]
+
+    # La ventana cubre el tramo de la base entero, para poder referirse a cualquier parte
+    window_log = max(10, (len(base_middle) + len(data_middle) - 1).bit_length())
+    params = zstd.ZstdCompressionParameters.from_level(ZSTD_LEVEL, window_log=window_log)
+    cctx = zstd.ZstdCompressor(dict_data=_delta_dict(base_middle), compression_params=params)
+    delta = cctx.compress(data_middle)
+
+    # La alternativa es el objeto comprimido completo. El delta tiene que ocupar a lo
+    # sumo la mitad: si no, no compensa depender de la base (que el restore lee entera).
+    packed = zstd.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    dest = object_path(object_id)
+    if len(delta) * 2 > len(packed):
+        _write_object(dest.with_name(dest.name + ZSTD_SUFFIX), packed)
+    else:
+        header = f"{base_id} {depth} {prefix} {suffix}\n".encode("ascii")
+        _write_object(dest.with_name(dest.name + DELTA_SUFFIX), header, delta)
+    return object_id
+
+
+def _copy_hashing(f_src: BinaryIO, f_dst: Any, h: Any) -> None:
+    """Copia 'f_src' en 'f_dst' por bloques, agregando cada bloque al hash 'h'."""
+    for chunk in iter(lambda: f_src.read(CHUNK_SIZE), b""):
+        h.update(chunk)
+        f_dst.write(chunk)
+
+
+def store_object(src: PathArg) -> str:
+    """Guarda el contenido de 'src' en objects/ y devuelve su hash.
+
+    El hash se calcula mientras se escribe el objeto, con una sola lectura: así el
+    objeto siempre coincide con su nombre, aunque el archivo cambie mientras tanto.
+    Si zstandard está instalado el objeto se guarda comprimido ('<hash>.zst');
+    si no, tal cual. Se escribe en un temporal que después se renombra (o se
+    borra, si ese contenido ya estaba guardado).
+    """
+    h = hashlib.sha1()
+    tmp = temp_path(OBJECTS_DIR / "objeto")
+    with open_binary(src, "rb") as f_src, open_binary(tmp, "wb") as f_dst:
+        if zstd is not None:
+            with zstd.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(f_dst, closefd=False) as f_zst:
+                _copy_hashing(f_src, f_zst, h)
+        else:
+            _copy_hashing(f_src, f_dst, h)
+
+    object_id = h.hexdigest()
+    if find_object(object_id) is not None:
+        tmp.unlink()
+        return object_id
+    dest = object_path(object_id)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    if zstd is not None:
+        dest = dest.with_name(dest.name + ZSTD_SUFFIX)
+    os.replace(tmp, dest)
+    return object_id
+
+
+def extract_object(obj_path: Path, dest: Path) -> None:
+    """Escribe en 'dest' el contenido original del objeto 'obj_path' (descomprimiendo si hace falta)."""
+    if obj_path.name.endswith(DELTA_SUFFIX):
+        dest.write_bytes(_apply_delta(obj_path))
+    elif obj_path.name.endswith(ZSTD_SUFFIX):
+        _require_zstd()
+        dctx = zstd.ZstdDecompressor()
+        with open_binary(obj_path, "rb") as f_src, open_binary(dest, "wb") as f_dst:
+            dctx.copy_stream(f_src, f_dst, read_size=CHUNK_SIZE, write_size=CHUNK_SIZE)
+    else:
+        reflink_or_copy(obj_path, dest)
 
 
 def ensure_repo_initialized() -> None:
@@ -80,8 +734,8 @@ def cmd_init() -> None:
     COMMITS_DIR.mkdir(parents=True, exist_ok=True)
     OBJECTS_DIR.mkdir(parents=True, exist_ok=True)
 
-    # Crear index.json vacío
-    save_json(INDEX_FILE, {"files": []})
+    # Crear el área de preparación vacía
+    save_index([])
 
     # Crear head.json inicial
     save_json(HEAD_FILE, {
@@ -101,8 +755,8 @@ def cmd_add(file_args: List[str]) -> None:
         print("Ejemplo: python minigit.py add archivo1.txt")
         sys.exit(1)
 
-    index = load_json(INDEX_FILE, {"files": []})
-    staged = set(index.get("files", []))
+    staged = load_index()
+    new_files: Set[str] = set()
 
     for arg in file_args:
         p = Path(arg)
@@ -116,22 +770,50 @@ def cmd_add(file_args: List[str]) -> None:
             # El archivo está fuera del repositorio actual
             rel = arg
 
-        if rel not in staged:
-            staged.add(rel)
-            print(f"Agregado al área de preparación: {rel}")
-        else:
+        if "\n" in rel:
+            # El index guarda una ruta por línea
+            print(f"Advertencia: el nombre de '{arg}' tiene un salto de línea y se omite.")
+            continue
+
+        # El index está ordenado: basta una búsqueda binaria para saber si ya está
+        i = bisect.bisect_left(staged, rel)
+        if (i < len(staged) and staged[i] == rel) or rel in new_files:
             print(f"Ya estaba en el área de preparación: {rel}")
+        else:
+            new_files.add(rel)
+            print(f"Agregado al área de preparación: {rel}")
+
+    if new_files:
+        # Mezclar las dos listas ordenadas sin volver a ordenar todo el index
+        save_index(list(heapq.merge(staged, sorted(new_files))))
+
+
+def _commit_one(src: str, st: os.stat_result, base: Optional[Tuple[str, int]],
+                known_hash: Optional[str]) -> Dict[str, Any]:
+    """Guarda el contenido de 'src' en objects/ y devuelve su entrada de la caché de 'stat'.
 
-    index["files"] = sorted(staged)
-    save_json(INDEX_FILE, index)
+    'st' es el 'stat' de 'src' ya hecho por cmd_commit, para no repetirlo.
+    Si 'base' no es None (deltas activados), es (hash, tamaño) del objeto respecto al
+    cual se intenta guardar como delta.
+    'known_hash' es el hash de la caché de 'stat' si el archivo no cambió desde que se guardó.
+    """
+    # Archivo sin cambios y objeto ya guardado: no hace falta ni abrir el archivo
+    if known_hash is not None and find_object(known_hash) is not None:
+        return {"hash": known_hash, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+    # El objeto se identifica por el hash de su contenido: objects/<hh>/<resto>.
+    # El hash se calcula al guardarlo; si el contenido ya estaba, no queda una copia nueva.
+    object_id = store_delta(src, *base) if base is not None else None
+    if object_id is None:
+        object_id = store_object(src)
+    return {"hash": object_id, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
 
 
 def cmd_commit(message: str) -> None:
     """Crea un nuevo commit con los archivos del área de preparación."""
     ensure_repo_initialized()
 
-    index = load_json(INDEX_FILE, {"files": []})
-    files = index.get("files", [])
+    files = load_index()
 
     if not files:
         print("No hay archivos en el área de preparación (index).")
@@ -143,25 +825,52 @@ def cmd_commit(message: str) -> None:
     current_id = int(head.get("current_commit_id", 0))
     new_id = last_id + 1
 
-    commit_files: Dict[str, str] = {}
+    # Con deltas activados, cada archivo se compara con su versión en el commit actual
+    parent_files: Dict[str, str] = {}
+    if load_json(CONFIG_FILE, {}).get("delta") and current_id != 0:
+        parent_files = (load_commit(current_id) or {}).get("files", {})
+
+    stat_cache, cache_mtime_ns = load_stat_cache()
 
+    # Un solo 'stat' por archivo: sirve para comprobar que existe y luego para la caché
+    root = os.fspath(REPO_DIR)
+    sources: List[Tuple[str, str, os.stat_result, Optional[Tuple[str, int]], Optional[str]]] = []
     for rel in files:
-        src = REPO_DIR / rel
-        if not src.is_file():
+        src = os.path.join(root, rel)
+        try:
+            st = os.stat(src)
+        except OSError:
+            st = None
+        if st is None or not stat.S_ISREG(st.st_mode):
             print(f"Error: el archivo '{rel}' ya no existe. Cancelo el commit.")
             sys.exit(1)
+        cached = stat_cache.get(rel)
+        known_hash = cached_hash(cached, st, cache_mtime_ns)
+
+        # Solo se intenta un delta si el archivo cambió y su tamaño está en rango. El
+        # tamaño de la base sale de la caché de 'stat': sin él no se sabe cuánta memoria
+        # necesita el delta, así que tampoco se intenta
+        base = None
+        base_id = parent_files.get(rel)
+        if (base_id is not None and known_hash is None and cached and cached.get("hash") == base_id
+                and DELTA_MIN_SIZE < st.st_size <= DELTA_MAX_SIZE):
+            base = (base_id, int(cached["size"]))
+        sources.append((rel, src, st, base, known_hash))
+
+    # Cada delta carga el archivo y la base completos en memoria: esos archivos se
+    # guardan de a uno, después de los demás (que van en paralelo)
+    plain = [item for item in sources if item[3] is None]
+    deltas = [item for item in sources if item[3] is not None]
+    entries: Dict[str, Dict[str, Any]] = {}
+    for item, entry in zip(plain, run_parallel(lambda item: _commit_one(*item[1:]), plain)):
+        entries[item[0]] = entry
+    for item in deltas:
+        entries[item[0]] = _commit_one(*item[1:])
 
-        # Nombre del archivo dentro de objects: <id>_<ruta_relativa_reemplazando_separadores>
-        safe_rel = rel.replace("\\", "__").replace("/", "__")
-        object_name = f"{new_id}_{safe_rel}"
-        dest = OBJECTS_DIR / object_name
-
-        # Copiar el contenido tal cual (modo binario)
-        dest.parent.mkdir(parents=True, exist_ok=True)
-        with src.open("rb") as f_src, dest.open("wb") as f_dest:
-            f_dest.write(f_src.read())
-
-        commit_files[rel] = object_name
+    commit_files: Dict[str, str] = {}
+    for rel in files:
+        commit_files[rel] = entries[rel]["hash"]
+        stat_cache[rel] = entries[rel]
 
     commit_data = {
         "id": new_id,
@@ -171,21 +880,36 @@ def cmd_commit(message: str) -> None:
         "files": commit_files
     }
 
-    save_json(COMMITS_DIR / f"{new_id}.json", commit_data)
+    append_commit(commit_data)
 
     # Actualizar head.json
     head["last_commit_id"] = new_id
     head["current_commit_id"] = new_id
     save_json(HEAD_FILE, head)
 
+    save_json(STAT_CACHE_FILE, stat_cache)
+
     # Limpiar el index (staging vacío)
-    save_json(INDEX_FILE, {"files": []})
+    save_index([])
 
     print(f"Commit {new_id} creado:")
     print(f'    Mensaje: "{message}"')
     print(f"    Archivos: {', '.join(sorted(commit_files.keys()))}")
 
 
+def _restore_one(rel: str, object_id: str, src: Path) -> Dict[str, Any]:
+    """Restaura 'rel' desde su objeto, guardado en 'src'.
+
+    Devuelve la nueva entrada de la caché de 'stat' (vacía para objetos antiguos).
+    """
+    dest = REPO_DIR / rel
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    extract_object(src, dest)
+    if is_content_id(object_id):
+        return stat_entry(dest, object_id)
+    return {}
+
+
 def cmd_restore(commit_id_str: str) -> None:
     """Restaura los archivos a la versión almacenada en un commit dado."""
     ensure_repo_initialized()
@@ -196,12 +920,11 @@ def cmd_restore(commit_id_str: str) -> None:
         print("Error: el id del commit debe ser un número entero.")
         sys.exit(1)
 
-    commit_path = COMMITS_DIR / f"{commit_id}.json"
-    if not commit_path.is_file():
+    commit_data = load_commit(commit_id)
+    if commit_data is None:
         print(f"Error: el commit {commit_id} no existe.")
         sys.exit(1)
 
-    commit_data = load_json(commit_path, None)
     if not commit_data:
         print(f"Error: el commit {commit_id} está corrupto o vacío.")
         sys.exit(1)
@@ -212,21 +935,41 @@ def cmd_restore(commit_id_str: str) -> None:
         print(f"Advertencia: el commit {commit_id} no contiene archivos.")
         sys.exit(0)
 
-    # Restaurar cada archivo
-    for rel, object_name in commit_files.items():
-        src = OBJECTS_DIR / object_name
-        dest = REPO_DIR / rel
+    stat_cache, _ = load_stat_cache()
 
-        if not src.is_file():
-            print(f"Advertencia: el objeto {object_name} no existe, no puedo restaurar {rel}.")
+    # Restaurar cada archivo. Los deltas cargan la base completa en memoria, así que se
+    # restauran de a uno, después de los demás (que van en paralelo)
+    items = list(commit_files.items())
+    sources = run_parallel(lambda item: find_object(item[1]), items)
+    plain: List[Tuple[str, str, Path]] = []
+    deltas: List[Tuple[str, str, Path]] = []
+    for (rel, object_id), src in zip(items, sources):
+        if src is None:
             continue
-
-        dest.parent.mkdir(parents=True, exist_ok=True)
-        with src.open("rb") as f_src, dest.open("wb") as f_dest:
-            f_dest.write(f_src.read())
-
+        if src.name.endswith(DELTA_SUFFIX):
+            deltas.append((rel, object_id, src))
+        else:
+            plain.append((rel, object_id, src))
+    results: Dict[str, Dict[str, Any]] = {}
+    try:
+        for item, entry in zip(plain, run_parallel(lambda item: _restore_one(*item), plain)):
+            results[item[0]] = entry
+        for item in deltas:
+            results[item[0]] = _restore_one(*item)
+    except RuntimeError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    for rel, object_id in items:
+        entry = results.get(rel)
+        if entry is None:
+            print(f"Advertencia: el objeto {object_id} no existe, no puedo restaurar {rel}.")
+            continue
+        if entry:
+            stat_cache[rel] = entry
         print(f"Restaurado: {rel}")
 
+    save_json(STAT_CACHE_FILE, stat_cache)
+
     # Actualizar HEAD para que apunte a este commit
     head = load_json(HEAD_FILE, {"last_commit_id": 0, "current_commit_id": 0})
     head["current_commit_id"] = commit_id
@@ -244,55 +987,93 @@ def cmd_log() -> None:
     """Muestra el historial de commits (similar a 'git log')."""
     ensure_repo_initialized()
 
-    if not COMMITS_DIR.exists():
-        print("No hay commits todavía.")
-        return
-
-    commit_files = sorted(COMMITS_DIR.glob("*.json"), key=lambda p: int(p.stem))
-
-    if not commit_files:
-        print("No hay commits todavía.")
-        return
+    head = load_json(HEAD_FILE, {"last_commit_id": 0, "current_commit_id": 0})
+    last_id = int(head.get("last_commit_id", 0))
 
-    print("Historial de commits:")
-    print("-" * 40)
-    for path in reversed(commit_files):  # del más reciente al más antiguo
-        data = load_json(path, {})
-        cid = data.get("id", path.stem)
+    printed = False
+    for data in iter_commit_summaries(last_id):  # del más reciente al más antiguo
+        if not printed:
+            print("Historial de commits:")
+            print("-" * 40)
+            printed = True
+        cid = data["id"]
         fecha = data.get("datetime", "desconocida")
         msg = data.get("message", "")
-        archivos = data.get("files", {})
+        archivos = data.get("files", [])
         print(f"Commit {cid}")
         print(f"Fecha: {fecha}")
         print(f'Mensaje: "{msg}"')
-        print(f"Archivos: {', '.join(sorted(archivos.keys()))}")
+        print(f"Archivos: {', '.join(archivos)}")
         print("-" * 40)
 
+    if not printed:
+        print("No hay commits todavía.")
+
 
 def _list_all_repo_files() -> List[str]:
-    """Lista todos los archivos del repo (excluyendo .minigit)."""
+    """Lista todos los archivos del repo (excluyendo .minigit).
+
+    Usa os.scandir, que ya sabe si cada entrada es archivo o carpeta sin otro
+    'stat', y no entra nunca en .minigit. Como Path.rglob, omite las carpetas
+    que no se pueden leer, no entra en enlaces a carpetas y sí lista los enlaces
+    a archivos.
+    """
     files: List[str] = []
-    for p in REPO_DIR.rglob("*"):
-        if p.is_file() and ".minigit" not in p.parts:
-            rel = str(p.relative_to(REPO_DIR))
-            files.append(rel)
+    root = os.fspath(REPO_DIR)
+    stack = [root]
+    while stack:
+        try:
+            it = os.scandir(stack.pop())
+        except PermissionError:
+            continue
+        with it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name != ".minigit":
+                        stack.append(entry.path)
+                elif entry.is_file():
+                    files.append(os.path.relpath(entry.path, root))
     return files
 
 
+def _status_one(rel: str, object_id: str, cached: Optional[Dict[str, Any]],
+                cache_mtime_ns: int) -> Optional[str]:
+    """Compara 'rel' con su objeto: devuelve "deleted", "modified" o None si no cambió."""
+    file_path = REPO_DIR / rel
+    obj_path = find_object(object_id)
+
+    if not file_path.exists():
+        return "deleted"
+
+    if obj_path is None:
+        # El objeto falta; lo consideramos "modificado"
+        return "modified"
+
+    if is_content_id(object_id):
+        # Si tamaño y fecha coinciden con la caché, el archivo no cambió: no hace falta leerlo
+        if cached_hash(cached, file_path.stat(), cache_mtime_ns) == object_id:
+            return None
+
+        # Objeto por contenido: basta con comparar el hash del archivo actual
+        return "modified" if hash_file(file_path) != object_id else None
+
+    # Objeto antiguo (sin hash): comparar contenidos
+    return None if files_equal(file_path, obj_path) else "modified"
+
+
 def cmd_status() -> None:
     """Muestra un resumen del estado actual del repositorio."""
     ensure_repo_initialized()
 
-    index = load_json(INDEX_FILE, {"files": []})
-    staged = set(index.get("files", []))
+    staged = set(load_index())
+    stat_cache, cache_mtime_ns = load_stat_cache()
 
     head = load_json(HEAD_FILE, {"last_commit_id": 0, "current_commit_id": 0})
     current_id = int(head.get("current_commit_id", 0))
 
     committed_files: Dict[str, str] = {}
     if current_id != 0:
-        commit_path = COMMITS_DIR / f"{current_id}.json"
-        commit_data = load_json(commit_path, {})
+        commit_data = load_commit(current_id) or {}
         committed_files = commit_data.get("files", {})
 
     all_files = set(_list_all_repo_files())
@@ -301,23 +1082,14 @@ def cmd_status() -> None:
     modified: List[str] = []
     deleted: List[str] = []
 
-    for rel, obj_name in committed_files.items():
-        file_path = REPO_DIR / rel
-        object_path = OBJECTS_DIR / obj_name
+    def check(item: Tuple[str, str]) -> Optional[str]:
+        return _status_one(item[0], item[1], stat_cache.get(item[0]), cache_mtime_ns)
 
-        if not file_path.exists():
+    for rel, state in zip(committed_files, run_parallel(check, committed_files.items())):
+        if state == "deleted":
             deleted.append(rel)
-            continue
-
-        if not object_path.is_file():
-            # El objeto falta; lo consideramos "modificado"
+        elif state == "modified":
             modified.append(rel)
-            continue
-
-        # Comparar contenidos
-        with file_path.open("rb") as f1, object_path.open("rb") as f2:
-            if f1.read() != f2.read():
-                modified.append(rel)
 
     # Archivos no rastreados: están en el repo pero no en el último commit ni en el index
     tracked_or_staged = set(committed_files.keys()) | staged